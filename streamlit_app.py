@@ -1,16 +1,26 @@
 import os
+import asyncio
 import base64
-import json
+import binascii
+import functools
+import logging
+import queue
+import threading
+from collections.abc import Mapping
 from pathlib import Path
 from datetime import datetime
 from inspect import signature as _sig
 import PIL.Image
-import base64
 from io import BytesIO
 import google.generativeai as genai
+from google.generativeai import client as genai_client
+from google.api_core import exceptions as google_exceptions
 
+import httpx
 import openai
+import pydantic
 import streamlit as st
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 # Optional git integration (GitPython)
 try:
@@ -18,12 +28,20 @@ try:
 except ImportError:
     git = None  # will warn later if token provided but lib missing
 
+# Optional local pre-filter (perceptual hashing)
+try:
+    import imagehash  # type: ignore
+except ImportError:
+    imagehash = None  # every photo goes to the models
+
+log = logging.getLogger(__name__)
+
 # ------------------------------------------------------------
 # 🧹  Room Inspector — Streamlit Web App (v6)
 # ------------------------------------------------------------
 # • Loads reference photo from disk (hidden)
 # • Captures new photo via camera (rear‑facing when supported)
-# • Uses OpenAI Vision to check cleanliness
+# • Uses OpenAI Vision and Gemini (in parallel) to check cleanliness
 # • If room is clean → writes timestamp to last_clean.txt AND pushes it to GitHub
 # ------------------------------------------------------------
 #   requirements.txt should now include: gitpython
@@ -33,16 +51,28 @@ st.set_page_config(page_title="Room Inspector", page_icon="🧹", layout="center
 st.title("🧹 Room Inspector v0.0.12")
 
 # ---------- Secrets / ENV -----------------------------------
+@st.cache_resource
+def _secrets_flat() -> dict:
+    """st.secrets flattened to dotted keys, resolved once per process."""
+    out = {}
+
+    def walk(node, prefix=""):
+        for k, v in node.items():
+            if isinstance(v, Mapping):
+                walk(v, f"{prefix}{k}.")
+            else:
+                out[f"{prefix}{k}"] = v
+
+    walk(st.secrets)
+    return out
+
+
 def _get_secret(path: str, default: str = ""):
     """Helper to read nested keys from st.secrets or env."""
-    keys = path.split(".")
-    node = st.secrets
-    for k in keys:
-        if k in node:
-            node = node[k]
-        else:
-            return os.getenv(path.upper().replace(".", "_"), default)
-    return node
+    flat = _secrets_flat()
+    if path in flat:
+        return flat[path]
+    return os.getenv(path.upper().replace(".", "_"), default)
 
 openai_api_key = st.text_input(
     "🔑 OpenAI API Key", type="password", value=_get_secret("openai.api_key")
@@ -54,45 +84,162 @@ gemini_api_key = st.text_input(
 
 github_token = _get_secret("github.token")  # personal access token with repo scope
 github_branch = _get_secret("github.branch", "main")
+github_repo = _get_secret("github.repo")  # "owner/name" – enables the REST upload path
 
 github_enabled = bool(github_token)
+if github_enabled and not github_repo and git is None:
+    st.warning("⚠️ GitPython not installed – cannot push to GitHub.")
 
 # ---------- Load reference image ----------------------------
+def file_to_b64(data: bytes, mime: str) -> str:
+    # encode straight into the prefixed buffer: one ASCII decode, no f-string copy
+    prefix = f"data:{mime};base64,".encode()
+    return (prefix + binascii.b2a_base64(data, newline=False)).decode("ascii")
+
+
+@st.cache_data
+def load_ref(path: str, mtime: float):
+    """Read & encode the reference photo once per (path, mtime)."""
+    data = Path(path).read_bytes()
+    mime = "image/jpeg" if path.lower().endswith(".jpg") else "image/png"
+    return data, mime, file_to_b64(data, mime)
+
+
+@st.cache_resource
+def load_ref_image(path: str, mtime: float) -> PIL.Image.Image:
+    """Decoded reference photo for the pHash pre-filter, shared across reruns."""
+    img = PIL.Image.open(path)
+    img.load()
+    return img
+
+
 ref_path = "reference_room.jpg"
 if not os.path.exists(ref_path):
     st.error(f"Reference photo missing: {ref_path}")
     st.stop()
-ref_bytes = Path(ref_path).read_bytes()
-ref_mime = "image/jpeg" if ref_path.lower().endswith(".jpg") else "image/png"
+ref_mtime = os.path.getmtime(ref_path)
 # (hidden from UI)
 
 # ---------- Capture new photo -------------------------------
-_camera_kwargs = {}
-if "mirror_image" in _sig(st.camera_input).parameters:
-    _camera_kwargs["mirror_image"] = False  # prefer rear camera when supported
+@st.cache_resource
+def _camera_supports_mirror() -> bool:
+    return "mirror_image" in _sig(st.camera_input).parameters
+
+
+# prefer rear camera when supported
+_camera_kwargs = {"mirror_image": False} if _camera_supports_mirror() else {}
 
 latest_file = st.camera_input(
     "📷 צלם תמונה חדשה של החדר (בחר מצלמה אחורית במכשיר נייד)",
     **_camera_kwargs,
 )
 
+# "low" sends a single 512px tile per image (85 tokens) – plenty for clean/messy
+high_detail = st.toggle("🔍 High-detail image analysis", value=False)
+image_detail = "high" if high_detail else "low"
+
+PROVIDER_OPENAI = "OpenAI gpt-4o"
+PROVIDER_GEMINI = "Gemini 2.5 Flash"
+PROVIDER_BOTH = "Both (majority vote)"
+provider = st.radio(
+    "🤖 Model", [PROVIDER_OPENAI, PROVIDER_GEMINI, PROVIDER_BOTH], horizontal=True
+)
+use_openai = provider != PROVIDER_GEMINI
+use_gemini = provider != PROVIDER_OPENAI
+
 # ------------------------------------------------------------
 
-def file_to_b64(data: bytes, mime: str) -> str:
-    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+def downscale_photo(data: bytes, max_side: int = 1024) -> PIL.Image.Image:
+    """Decode a camera photo and shrink it to at most max_side px."""
+    img = PIL.Image.open(BytesIO(data))
+    img.thumbnail((max_side, max_side), PIL.Image.LANCZOS)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
 
 
-def push_last_clean_to_github(files):
-    """Commit & push last_clean.txt if Git token is available."""
-    if not github_enabled:
+def encode_jpeg(img: PIL.Image.Image, quality: int = 85, optimize: bool = False) -> bytes:
+    # optimize=True costs a second Huffman pass – not worth it on the click path
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=quality, optimize=optimize, progressive=False)
+    return buf.getvalue()
+
+
+GITHUB_API = "https://api.github.com"
+_github_shas: dict = {}  # path -> blob sha of the last known version on the branch
+
+
+# The git worker thread has no Streamlit script context, so its long-lived
+# handles are cached with functools rather than st.cache_resource.
+
+@functools.lru_cache(maxsize=None)
+def _github_client() -> httpx.Client:
+    return httpx.Client(
+        base_url=GITHUB_API,
+        headers={
+            "Authorization": f"Bearer {github_token}",
+            "Accept": "application/vnd.github+json",
+        },
+        timeout=30,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _git_repo():
+    return git.Repo(".")
+
+
+def _github_sha(client: httpx.Client, url: str):
+    """Current blob sha of url on the branch, or None if the file is new."""
+    r = client.get(url, params={"ref": github_branch})
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return r.json()["sha"]
+
+
+def _put_file(client: httpx.Client, path: str):
+    """PUT one file; on a stale cached sha (409/422) refetch it and retry once."""
+    url = f"/repos/{github_repo}/contents/{path}"
+    content = base64.b64encode(Path(path).read_bytes()).decode()
+    for attempt in range(2):
+        if path not in _github_shas:
+            _github_shas[path] = _github_sha(client, url)
+        body = {"message": "Update", "content": content, "branch": github_branch}
+        if _github_shas[path]:
+            body["sha"] = _github_shas[path]
+        r = client.put(url, json=body)
+        if r.status_code in (409, 422) and attempt == 0:
+            _github_shas.pop(path, None)  # changed on the branch by another route
+            continue
+        r.raise_for_status()
+        _github_shas[path] = r.json()["content"]["sha"]
         return
+
+
+def _push_via_contents_api(files):
+    """Upload each file with one PUT to the GitHub Contents API."""
+    client = _github_client()
+    uploaded = []
+    for path in files:
+        try:
+            _put_file(client, path)
+        except Exception:
+            _github_shas.pop(path, None)
+            log.exception("Upload of %s to GitHub failed", path)
+        else:
+            uploaded.append(path)
+    log.info("Uploaded %s to GitHub", uploaded)
+
+
+def _push_via_git(files):
+    """Fallback for local dev without github.repo: commit & git push."""
     if git is None:
-        st.warning("⚠️ GitPython not installed – cannot push to GitHub.")
         return
     try:
-        repo = git.Repo(".")
+        repo = _git_repo()
     except git.exc.InvalidGitRepositoryError:
-        st.warning("⚠️ Current directory is not a git repository – skipping push.")
+        log.warning("Current directory is not a git repository – skipping push.")
         return
 
     # write timestamp file (already done by caller) and commit
@@ -113,85 +260,294 @@ def push_last_clean_to_github(files):
 
     try:
         origin.push(f"HEAD:{github_branch}")
-        st.info("📤 הניסיון הועלה לגיטהאב")
+        log.info("Pushed %s to GitHub", files)
     except Exception as e:
-        st.warning(f"⚠️ שגיאה בעת הדחיפה ל‑GitHub: {e}")
+        log.warning("Push to GitHub failed: %s", e)
     finally:
         # restore original URL to avoid token leakage in .git/config
         if github_token and old_url:
             origin.set_url(old_url)
 
-def compare_rooms_in_with_gemini(api_key: str, reference_image_b64, new_image_b64) -> dict:
-    """
-    Compares two images using the Gemini API and returns a structured JSON response.
-    This version is adapted to take image data from Streamlit widgets.
 
-    Args:
-        api_key: The user's Google AI API key.
-        reference_image_data: The image data for the reference image.
-        new_image_data: The image data for the new image.
+class RoomResult(pydantic.BaseModel):
+    """Verdict returned by every provider (and by the local pre-filter)."""
+    same_room: bool
+    is_clean: bool
+    is_too_narrow_photo: bool
+    suggestions: list[str]
 
-    Returns:
-        A dictionary containing the analysis from the Gemini API.
+
+# Perceptual-hash distance (0..64) between the new photo and the reference.
+# At or below this the photo is practically the reference shot → clean. On the
+# labelled archive every class (clean / not_clean / diff_room) spans 22–44, so
+# pHash cannot tell a different room apart and is only used for near-duplicates.
+PHASH_SAME_MAX = 4
+
+
+@st.cache_data
+def ref_phash(path: str, mtime: float):
+    return imagehash.phash(load_ref_image(path, mtime))
+
+
+def phash_verdict(img: PIL.Image.Image):
+    """Clean verdict for near-duplicates of the reference, else None (ask the models)."""
+    if imagehash is None:
+        return None
+    distance = imagehash.phash(img) - ref_phash(ref_path, ref_mtime)
+    if distance <= PHASH_SAME_MAX:
+        return RoomResult(same_room=True, is_clean=True, is_too_narrow_photo=False, suggestions=[])
+    return None
+
+
+def push_last_clean_to_github(files):
+    """Commit & push the given files if Git token is available.
+
+    Runs on the background git worker, so it reports via logging rather
+    than Streamlit widgets.
     """
-    try:
-        # Configure the generative AI client with the API key
-        genai.configure(api_key=api_key)
+    if not github_enabled:
+        return
+    if github_repo:
+        _push_via_contents_api(files)
+    else:
+        _push_via_git(files)
+
 
-        # Load the images from the image data
-        decoded_bytes = base64.b64decode(reference_image_b64)
-        reference_img = PIL.Image.open(BytesIO(decoded_bytes))
+def _git_worker(q: queue.Queue):
+    """Save queued photos to disk and push each backlog as a single commit.
+
+    Queue items are ``(file_name, data, extra_files)``; extra_files are
+    already on disk and only need pushing.
+    """
+    while True:
+        batch = [q.get()]
+        while not q.empty():
+            batch.append(q.get_nowait())
+        files = []
+        for file_name, data, extra_files in batch:
+            try:
+                Path(file_name).write_bytes(data)
+            except OSError:
+                log.exception("Could not save %s", file_name)
+                continue
+            files += [file_name, *extra_files]
+        files = list(dict.fromkeys(files))
+        if not files:
+            continue
+        try:
+            push_last_clean_to_github(files)
+        except Exception:
+            log.exception("Git worker failed to push %s", files)
+
+
+@st.cache_resource
+def git_queue() -> queue.Queue:
+    """One queue + daemon worker per process, shared by every session."""
+    q = queue.Queue()
+    threading.Thread(target=_git_worker, args=(q,), daemon=True).start()
+    return q
+
+
+# Retry transient provider failures (429 / 5xx / dropped connections) in place,
+# so the user does not have to re-click and re-upload the photo.
+openai_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, max=8),
+    retry=retry_if_exception_type(
+        (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+    ),
+    reraise=True,
+)
+gemini_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, max=8),
+    retry=retry_if_exception_type(
+        (
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+        )
+    ),
+    reraise=True,
+)
 
-        decoded_bytes = base64.b64decode(new_image_b64)
-        new_img = PIL.Image.open(BytesIO(decoded_bytes))
 
-        new_img = PIL.Image.open(new_image_data)
+SYSTEM_PROMPT = (
+    "You are an expert interior organiser.\n"
+    "You check if a kid's room is clean or not by comparing two images.\n"
+    "The kid will try to fool you by taking a photo of a different room or by hiding the mess.\n"
+    "Compare the two images.\n"
+    "A room is not clean if there is a blanket on the floor\n"
+    "When checking if the same room, make sure the picture shows the same furnitures\n"
+    "Respond ONLY with valid JSON: \n"
+    "{\n"
+    "  \"same_room\": true|false,\n"
+    "  \"is_clean\": true|false,\n"
+    "  \"is_too_narrow_photo\": true|false,\n"
+    "  \"suggestions\": [\"tip 1\", \"tip 2\"]\n"
+    "}\n"
+    "is_too_narrow_photo is true if the latest photo is too cropped to judge the whole room.\n"
+    "If is_clean is true, suggestions may be an empty array.\n"
+    "If is_clean is false, suggestions MUST be written in HEBREW."
+)
 
-        # Initialize the generative model
-        model = genai.GenerativeModel('gemini-2.5-flash-latest')
 
-        # The prompt asking for a JSON response.
-        prompt = """
-        Analyze the two images. The first is a reference, the second is a new picture.
-        Respond ONLY with a JSON object in the following format. Do not include any other text or markdown formatting.
+@st.cache_resource
+def base_messages(path: str, mtime: float, detail: str) -> list:
+    """System prompt + reference-photo message, identical for every click.
 
+    Shared across sessions – callers must extend a copy, never mutate it.
+    """
+    _, _, ref_b64 = load_ref(path, mtime)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
         {
-          "is_the_same_room": <boolean>,
-          "is_clean": <boolean>,
-          "is_picture_wide_enough": <boolean>,
-          "differences": "<A string describing the differences between the two images.>",
-          "suggestions_hebrew": "<A string with suggestions in Hebrew. If the room is messy, suggest how to clean it. If the photo is cropped, suggest how to take a wider photo. If no suggestions are needed, leave this as an empty string.>"
-        }
-
-        Based on the images, determine the values for the JSON fields.
-        - `is_the_same_room`: true if they depict the same room, otherwise false.
-        - `is_clean`: true if the new picture shows a tidy room, otherwise false.
-        - `is_picture_wide_enough`: true if the new picture captures the room well, false if it seems too cropped.
-        """
-
-        # Send the prompt and the images to the model
-        response = model.generate_content([prompt, reference_img, new_img])
-
-        # Clean up the response to ensure it's valid JSON.
-        cleaned_response_text = response.text.strip().replace("```json", "").replace("```", "")
-        
-        # Parse the JSON string into a Python dictionary
-        json_response = json.loads(cleaned_response_text)
-        return json_response
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Reference room photo:"},
+                {"type": "image_url", "image_url": {"url": ref_b64, "detail": detail}},
+            ],
+        },
+    ]
 
-    except json.JSONDecodeError:
-        return {"error": "Failed to decode JSON from the API response.", "raw_response": response.text}
-    except Exception as e:
-        return {"error": f"An unexpected error occurred: {e}"}
+
+# The Gemini prompt asking for a JSON response.
+GEMINI_PROMPT = """
+Analyze the two images. The first is a reference, the second is a new picture.
+Respond ONLY with a JSON object in the following format. Do not include any other text or markdown formatting.
+
+{
+  "same_room": <boolean>,
+  "is_clean": <boolean>,
+  "is_too_narrow_photo": <boolean>,
+  "suggestions": ["<A suggestion in Hebrew. If the room is messy, suggest how to clean it. If the photo is cropped, suggest how to take a wider photo. If no suggestions are needed, leave this as an empty array.>"]
+}
+
+Based on the images, determine the values for the JSON fields.
+- `same_room`: true if they depict the same room, otherwise false.
+- `is_clean`: true if the new picture shows a tidy room, otherwise false.
+- `is_too_narrow_photo`: true if the new picture seems too cropped to capture the room, otherwise false.
+"""
+
+
+@st.cache_resource
+def get_openai(api_key: str) -> openai.OpenAI:
+    """One keep-alive (HTTP/2) OpenAI client per API key, reused across reruns.
+
+    SDK-level retries are off: openai_retry is the only retry layer.
+    """
+    return openai.OpenAI(
+        api_key=api_key,
+        max_retries=0,
+        http_client=httpx.Client(
+            http2=True, limits=httpx.Limits(max_keepalive_connections=8)
+        ),
+    )
+
+
+@st.cache_resource
+def _gemini_configure_lock() -> threading.Lock:
+    return threading.Lock()
+
+
+@st.cache_resource
+def get_gemini(api_key: str) -> genai.GenerativeModel:
+    """Configure Gemini once per API key and keep the model handle.
+
+    genai.configure() is process-wide and a model otherwise binds its client
+    lazily on its first request, by which time another session may have
+    configured a different key. The client is therefore built (no network
+    call) and attached under the lock, while this key is the configured one.
+    """
+    with _gemini_configure_lock():
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(
+            'gemini-2.5-flash-latest',
+            generation_config={"response_mime_type": "application/json"},
+        )
+        model._client = genai_client.get_default_generative_client()
+    return model
+
+
+# Each click runs its own asyncio.run() loop, and async clients are bound to
+# the loop they were created on. The cached clients are therefore the sync
+# ones, driven from worker threads so the two providers still overlap.
+
+async def analyze_openai(api_key: str, messages: list) -> RoomResult:
+    """Send the comparison prompt to OpenAI gpt-4o and return the parsed verdict."""
+    client = get_openai(api_key)
+
+    @openai_retry
+    def _call():
+        with client.chat.completions.stream(
+            model="gpt-4o-2024-08-06",
+            messages=messages,
+            temperature=0,
+            response_format=RoomResult,
+        ) as stream:
+            message = stream.get_final_completion().choices[0].message
+        if message.parsed is None:
+            raise ValueError(message.refusal or "empty response")
+        return message.parsed
+
+    return await asyncio.to_thread(_call)
+
+
+async def analyze_gemini(api_key: str, reference_blob: dict, new_jpeg: bytes) -> RoomResult:
+    """
+    Compares two images using the Gemini API and returns a structured JSON response.
+    Both images are sent as raw bytes blobs, so the SDK neither re-reads a
+    file nor re-serializes a PIL image: the reference is the original file
+    content cached by load_ref, and the new photo is the q85 JPEG the caller
+    already encoded for OpenAI.
+
+    Args:
+        api_key: The user's Google AI API key.
+        reference_blob: {"mime_type", "data"} of the cached reference bytes (see load_ref).
+        new_jpeg: The downscaled new photo as JPEG bytes (see encode_jpeg).
+
+    Returns:
+        The RoomResult parsed from the Gemini response.
+    """
+    model = get_gemini(api_key)
+
+    # Send the prompt and the images to the model; retry=None turns off the
+    # client's own retry so gemini_retry is the only layer
+    @gemini_retry
+    def _call():
+        return model.generate_content(
+            [GEMINI_PROMPT, reference_blob, {"mime_type": "image/jpeg", "data": new_jpeg}],
+            request_options={"retry": None},
+        )
+
+    response = await asyncio.to_thread(_call)
+
+    # Parse and validate the JSON response in one pass
+    return RoomResult.model_validate_json(response.text)
+
+
+def combine_verdicts(answers: list) -> RoomResult:
+    """With two voters a majority means both agree."""
+    return RoomResult(
+        same_room=all(a.same_room for a in answers),
+        is_clean=all(a.is_clean for a in answers),
+        is_too_narrow_photo=any(a.is_too_narrow_photo for a in answers),
+        suggestions=[tip for a in answers for tip in a.suggestions],
+    )
+
+
+async def analyze_all(*factories):
+    """Run the provider calls concurrently; failures are returned, not raised."""
+    return await asyncio.gather(*(f() for f in factories), return_exceptions=True)
 
 # ---------- Analyse button ----------------------------------
 if st.button("🧐 נתח את החדר", type="primary"):
 
-    if not openai_api_key:
+    if use_openai and not openai_api_key:
         st.error("יש להזין מפתח API של OpenAI.")
         st.stop()
 
-    if not gemini_api_key:
+    if use_gemini and not gemini_api_key:
         st.error("יש להזין מפתח API של Gemini.")
         st.stop()
 
@@ -199,75 +555,57 @@ if st.button("🧐 נתח את החדר", type="primary"):
         st.error("צלם תמונה חדשה של החדר תחילה.")
         st.stop()
 
-    client = openai.OpenAI(api_key=openai_api_key)
-
-    ref_b64 = file_to_b64(ref_bytes, ref_mime)
-    latest_b64 = file_to_b64(latest_file.getvalue(), latest_file.type)
-
-    system_prompt = (
-        "You are an expert interior organiser.\n"
-        "You check if a kid's room is clean or not by comparing two images.\n"
-        "The kid will try to fool you by taking a photo of a different room or by hiding the mess.\n"
-        "Compare the two images.\n"
-        "A room is not clean if there is a blanket on the floor\n",
-        "When checking if the same room, make sure the picture shows the same furnitures\n",
-        "Respond ONLY with valid JSON: \n"
-        "{\n"
-        "  \"same_room\": true|false,\n"
-        "  \"is_clean\": true|false,\n"
-        "  \"suggestions\": [\"tip 1\", \"tip 2\"]\n"
-        "}\n"
-        "If is_clean is true, suggestions may be an empty array.\n",
-        "If is_clean is false, suggestions MUST be written in HEBREW."
-    )
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": "Reference room photo:"},
-                {"type": "image_url", "image_url": {"url": ref_b64}},
-            ],
-        },
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": "Latest room photo:"},
-                {"type": "image_url", "image_url": {"url": latest_b64}},
-            ],
-        },
-    ]
-
-    with st.spinner("שולח בקשה ל‑OpenAI ..."):
-        try:
-            resp = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0,
-            )
-            content = resp.choices[0].message.content.strip()
-            if content.startswith("```json"):
-                content = content.removeprefix("```json").removesuffix("```")
-            data = json.loads(content)
-        except json.JSONDecodeError:
-            st.error("❌ לא הצלחתי לנתח את תגובת OpenAI (JSON שגוי).")
-            st.text(content)
-            st.stop()
-        except Exception as e:
-            st.error(f"שגיאת OpenAI: {e}")
+    # full-resolution camera shots are overkill for the comparison
+    latest_img = downscale_photo(latest_file.getvalue())
+
+    data = phash_verdict(latest_img)
+    if data is None:
+        # one JPEG encode shared by both providers
+        latest_jpeg = encode_jpeg(latest_img)
+        factories = {}
+        if use_openai:
+            latest_b64 = file_to_b64(latest_jpeg, "image/jpeg")
+            messages = base_messages(ref_path, ref_mtime, image_detail) + [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": "Latest room photo:"},
+                        {"type": "image_url", "image_url": {"url": latest_b64, "detail": image_detail}},
+                    ],
+                },
+            ]
+            factories["OpenAI"] = lambda: analyze_openai(openai_api_key, messages)
+        if use_gemini:
+            ref_bytes, ref_mime, _ = load_ref(ref_path, ref_mtime)
+            ref_blob = {"mime_type": ref_mime, "data": ref_bytes}
+            factories["Gemini"] = lambda: analyze_gemini(gemini_api_key, ref_blob, latest_jpeg)
+
+        with st.spinner(f"שולח בקשה ל‑{' ול‑'.join(factories)} ..."):
+            results = asyncio.run(analyze_all(*factories.values()))
+
+        answers = []
+        for name, result in zip(factories, results):
+            if isinstance(result, pydantic.ValidationError):
+                st.error(f"❌ לא הצלחתי לנתח את תגובת {name} (JSON שגוי).")
+                st.text(str(result))
+            elif isinstance(result, Exception):
+                st.error(f"שגיאת {name}: {result}")
+            else:
+                answers.append(result)
+        if not answers:
             st.stop()
+        data = combine_verdicts(answers)
 
     # ---------- Present results & Git push -------------------
     timestamp = datetime.now().isoformat()
     file_name = timestamp
     clean = False
-    if not data.get("same_room", False):
+    if not data.same_room:
         st.error("❗ נראה כי אלו אינם אותו חדר.")
         file_name += "_diff_room"
         
     else:
-        if data.get("is_clean", False):
+        if data.is_clean:
             st.success("✅ החדר נראה מסודר ונקי — כל הכבוד!")
             file_name += "_clean"
             try:
@@ -279,14 +617,13 @@ if st.button("🧐 נתח את החדר", type="primary"):
         else:
             st.warning("🧹 החדר אינו מסודר. הצעות לשיפור:")
             file_name += "not_clean"
-            for tip in data.get("suggestions", []):
+            for tip in data.suggestions:
                 st.markdown(f"- {tip}")
 
+    if data.is_too_narrow_photo:
+        st.info("📷 התמונה צרה מדי — נסה לצלם את החדר מזווית רחבה יותר.")
+
     file_name += ".jpg"
-    # Save to disk
-    with open(file_name, "wb") as f:
-        f.write(latest_file.getvalue())
-    files_to_push = [file_name]
-    if clean:
-        files_to_push.append("last_clean.txt")
-    push_last_clean_to_github(files_to_push)
+    # Save to disk & push in the background
+    extra_files = ["last_clean.txt"] if clean else []
+    git_queue().put((file_name, latest_file.getvalue(), extra_files))